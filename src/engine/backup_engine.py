@@ -1,23 +1,104 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
-import argparse
+import atexit
 import ctypes
 import datetime as dt
+import errno
 import fnmatch
 import hashlib
 import json
+import logging
+import mmap
 import os
 import platform
+import queue
+import re
 import shutil
-import subprocess
-import tempfile
 import threading
-import time
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import List, Tuple, Optional
 
+# ilerleme mesajları bu logger'a gider; GUI kendi handler'ını bağlar
+log = logging.getLogger(__name__)
+
 IS_WIN = platform.system().lower().startswith("win")
+IS_MAC = platform.system() == "Darwin"
+
+if not IS_WIN:
+    import fcntl
+
+BACKUP_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+RESTORE_WORKERS = 8
+
+# CDC_MIN_SIZE üzerindeki dosyalar (fastcdc kuruluysa) içerik tabanlı
+# parçalara bölünür; değişen büyük dosyada yalnızca değişen parçalar saklanır.
+CDC_MIN_SIZE = 64 * 1024 * 1024
+CDC_MIN_CHUNK = 256 * 1024
+CDC_AVG_CHUNK = 1024 * 1024
+CDC_MAX_CHUNK = 4 * 1024 * 1024
+
+# okuma/hash parça boyutu; BACKUP_HASH_CHUNK ortam değişkeniyle (bayt)
+# değiştirilebilir, bol RAM'li sistemlerde 16 MiB syscall sayısını azaltır.
+# Geçersiz ya da <= 0 değerler yok sayılır (0 boyutlu tampon her dosyayı boş
+# hash'lerdi), küçük değerler HASH_CHUNK_MIN'e yükseltilir.
+HASH_CHUNK_DEFAULT = 4 * 1024 * 1024
+HASH_CHUNK_MIN = 64 * 1024
+
+
+def _env_hash_chunk() -> int:
+    try:
+        n = int(os.environ.get("BACKUP_HASH_CHUNK", HASH_CHUNK_DEFAULT))
+    except ValueError:
+        return HASH_CHUNK_DEFAULT
+    if n <= 0:
+        return HASH_CHUNK_DEFAULT
+    return max(n, HASH_CHUNK_MIN)
+
+
+HASH_CHUNK = _env_hash_chunk()
+
+try:
+    import fastcdc
+except ImportError:
+    fastcdc = None
+
+# orjson kuruluysa manifest ve log satırları onunla kodlanır/çözülür
+try:
+    import orjson
+
+    def _dumps(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+    _loads = orjson.loads
+except ImportError:
+    def _dumps(obj) -> str:
+        return json.dumps(obj, ensure_ascii=False)
+
+    _loads = json.loads
+
+# Snapshot girdileri her zaman manifest.jsonl'e yazılır; böylece repo
+# msgpack'siz bir kurulumda da okunabilir. msgpack kuruluysa aynı girdiler
+# ayrıca manifest.msgpack'e ikili olarak yazılır ve okumada o tercih edilir.
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MANIFEST_ENTRIES = "manifest.jsonl"
+MANIFEST_MSGPACK = "manifest.msgpack"
+
+
+def _pack_entry(entry: list) -> bytes:
+    return (_dumps(entry) + "\n").encode("utf-8")
+
+# Girdiler diskte anahtarsız, konumsal diziler olarak tutulur; alan sırası
+# manifest başlığında "schema" olarak bir kez yazılır. Parçasız dosyalarda
+# "chunks" alanı null'dır.
+MANIFEST_SCHEMA = ["path", "hash", "size", "mtime", "mtime_ns", "ino", "chunks"]
 
 
 # ----------------------------
@@ -25,49 +106,592 @@ IS_WIN = platform.system().lower().startswith("win")
 # ----------------------------
 
 class Logger:
+    FLUSH_EVERY = 256
+
     def __init__(self, log_file: Optional[Path]):
         self.log_file = log_file
-        self.lock = threading.Lock()
+        self._fh = None
+        self._q = None
+        self._thread = None
         if log_file:
             log_file.parent.mkdir(parents=True, exist_ok=True)
+            # dosya Logger ömrü boyunca açık kalır; satırlar kuyruğa bırakılır
+            # ve tek bir yazıcı thread'i tarafından yazılır, çağıran beklemez
+            self._fh = log_file.open("a", encoding="utf-8", buffering=1 << 20)
+            self._q = queue.Queue()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        fh = self._fh
+        pending = 0
+        while True:
+            line = self._q.get()
+            if line is None:
+                fh.flush()
+                self._q.task_done()
+                return
+            if line is _FLUSH:
+                fh.flush()
+                pending = 0
+            else:
+                fh.write(line)
+                fh.write("\n")
+                pending += 1
+                # kuyruk boşaldığında ya da FLUSH_EVERY satırda bir diske itilir
+                if pending >= self.FLUSH_EVERY or self._q.empty():
+                    fh.flush()
+                    pending = 0
+            self._q.task_done()
 
     def write(self, obj: dict):
-        line = json.dumps(obj, ensure_ascii=False)
-        if self.log_file:
-            with self.lock:
-                with self.log_file.open("a", encoding="utf-8") as f:
-                    f.write(line + "\n")
-        else:
+        line = _dumps(obj)
+        if self._q is not None:
+            self._q.put(line)
+        elif not self.log_file:
             print(line)
 
+    def flush(self):
+        if self._q is not None:
+            self._q.put(_FLUSH)
+            self._q.join()
+
+    def close(self):
+        if self._thread is not None:
+            self._q.put(None)
+            self._thread.join()
+            self._thread = None
+            self._q = None
+            self._fh.close()
+            self._fh = None
+        atexit.unregister(self.close)
+
+
+_FLUSH = object()
+
 
 # ----------------------------
 # Helpers
 # ----------------------------
 
-def sha256_file(path: Path) -> str:
-    h = hashlib.sha256()
-    with path.open("rb") as f:
+def _load_libcrypto():
+    # hashlib zaten OpenSSL EVP üzerinden çalışıyorsa (SHA-NI dahil) ek bir
+    # şeye gerek yok; yalnızca yerleşik yazılım SHA-256'ya düşüldüyse
+    # libcrypto doğrudan ctypes ile kullanılır.
+    if getattr(hashlib.sha256, "__name__", "") == "openssl_sha256":
+        return None
+
+    if IS_WIN:
+        names = ["libcrypto-3-x64.dll", "libcrypto-3.dll"]
+    else:
+        names = ["libcrypto.so.3", "libcrypto.3.dylib", "libcrypto.so"]
+
+    for name in names:
+        try:
+            lib = ctypes.CDLL(name)
+        except OSError:
+            continue
+        lib.EVP_MD_CTX_new.restype = ctypes.c_void_p
+        lib.EVP_MD_CTX_free.argtypes = [ctypes.c_void_p]
+        lib.EVP_sha256.restype = ctypes.c_void_p
+        lib.EVP_DigestInit_ex.argtypes = [ctypes.c_void_p, ctypes.c_void_p, ctypes.c_void_p]
+        lib.EVP_DigestUpdate.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_size_t]
+        lib.EVP_DigestFinal_ex.argtypes = [ctypes.c_void_p, ctypes.c_char_p, ctypes.c_void_p]
+        return lib
+    return None
+
+
+_libcrypto = _load_libcrypto()
+
+# hash kurucusu modül yüklenirken bir kez seçilir; sıcak yol tek çağrıdır
+_sha256_ctor = hashlib.sha256
+
+# boş bir SHA-256 nesnesi bir kez kurulur, dosya başına .copy() ile
+# çoğaltılır; OpenSSL bağlamı her seferinde sıfırdan hazırlanmaz
+_SHA256_TEMPLATE = hashlib.sha256()
+_sha256_new = _SHA256_TEMPLATE.copy
+
+
+def _evp_sha256_file(path: Path) -> str:
+    lib = _libcrypto
+    ctx = lib.EVP_MD_CTX_new()
+    if not ctx:
+        raise MemoryError("EVP_MD_CTX_new başarısız")
+    try:
+        lib.EVP_DigestInit_ex(ctx, lib.EVP_sha256(), None)
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            while True:
+                b = os.read(fd, HASH_CHUNK)
+                if not b:
+                    break
+                lib.EVP_DigestUpdate(ctx, b, len(b))
+        finally:
+            os.close(fd)
+        out = ctypes.create_string_buffer(32)
+        lib.EVP_DigestFinal_ex(ctx, out, None)
+        return out.raw.hex()
+    finally:
+        lib.EVP_MD_CTX_free(ctx)
+
+
+MMAP_MIN_SIZE = 16 * 1024 * 1024
+
+# her iş parçacığı tek bir HASH_CHUNK tamponunu yeniden kullanır;
+# readinto ile okunur, parça başına bytes ayrılmaz
+_tls = threading.local()
+
+
+def _read_buf() -> memoryview:
+    mv = getattr(_tls, "mv", None)
+    if mv is None:
+        mv = _tls.mv = memoryview(bytearray(HASH_CHUNK))
+    return mv
+
+# TREE_MIN_SIZE üzerindeki dosyaların içerik adresi düz SHA-256 değildir:
+# dosya TREE_CHUNK'lık dilimlere bölünür, dilimler paralel hash'lenir ve
+# sha256(dilim özetleri + 8 bayt little-endian boyut) alınır. Çakışma direnci
+# SHA-256 ile aynıdır; kural manifest başlığında HASH_SCHEME olarak saklanır.
+TREE_MIN_SIZE = 32 * 1024 * 1024
+TREE_CHUNK = 8 * 1024 * 1024
+HASH_SCHEME = "sha256/tree-8m>32m"
+
+# blake3 kuruluysa içerik adresi BLAKE3 ile hesaplanır (tek dosya içinde de
+# çok iş parçacıklı). Hash yalnızca iç adres olarak kullanıldığından farklı
+# algoritmalar aynı .store altında birlikte yaşayabilir; BACKUP_HASH=sha256
+# ile eski şemaya dönülür.
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
+if blake3 is not None and os.environ.get("BACKUP_HASH", "blake3") == "blake3":
+    HASH_ALGO = "blake3"
+    HASH_SCHEME = "blake3"
+    _hash_ctor = blake3.blake3
+else:
+    HASH_ALGO = "sha256"
+    _hash_ctor = _sha256_ctor
+
+_tree_pool = None
+_tree_pool_lock = threading.Lock()
+
+
+def _get_tree_pool() -> ThreadPoolExecutor:
+    global _tree_pool
+    with _tree_pool_lock:
+        if _tree_pool is None:
+            _tree_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1)
+        return _tree_pool
+
+
+def _digest(data) -> bytes:
+    return _sha256_ctor(data).digest()
+
+
+def _fold_tree(digests: List[bytes], size: int) -> str:
+    return _sha256_ctor(b"".join(digests) + size.to_bytes(8, "little")).hexdigest()
+
+
+class TreeHasher:
+    # hashlib nesnesi gibi akışla beslenen dilim-ağacı hash'i; dolan her
+    # TREE_CHUNK dilimi havuzda hash'lenirken okuma devam eder
+    def __init__(self):
+        self._buf = bytearray()
+        self._futs = []
+        self._done = 0
+        self._size = 0
+        self._limit = 2 * (os.cpu_count() or 1)
+
+    def _submit(self, part: bytes):
+        self._futs.append(_get_tree_pool().submit(_digest, part))
+        # okuma hash'ten hızlıysa bellekte biriken dilim sayısı sınırlanır
+        if len(self._futs) - self._done > self._limit:
+            self._futs[self._done].result()
+            self._done += 1
+
+    def update(self, data):
+        self._size += len(data)
+        self._buf += data
+        while len(self._buf) >= TREE_CHUNK:
+            self._submit(bytes(self._buf[:TREE_CHUNK]))
+            del self._buf[:TREE_CHUNK]
+
+    def hexdigest(self) -> str:
+        if self._buf:
+            self._submit(bytes(self._buf))
+            self._buf = bytearray()
+        return _fold_tree([f.result() for f in self._futs], self._size)
+
+
+def new_hasher(size: int):
+    if HASH_ALGO == "blake3":
+        if size > TREE_MIN_SIZE:
+            return blake3.blake3(max_threads=blake3.blake3.AUTO)
+        return blake3.blake3()
+    if size > TREE_MIN_SIZE:
+        return TreeHasher()
+    return _sha256_new()
+
+
+def sha256_file(path) -> str:
+    size = os.stat(path).st_size
+    if size > TREE_MIN_SIZE:
+        with open(path, "rb") as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            mv = memoryview(mm)
+            slices = []
+            try:
+                slices = [mv[o:o + TREE_CHUNK] for o in range(0, len(mm), TREE_CHUNK)]
+                digests = list(_get_tree_pool().map(_digest, slices))
+            finally:
+                for sl in slices:
+                    sl.release()
+                mv.release()
+            return _fold_tree(digests, len(mm))
+
+    if _libcrypto is not None:
+        return _evp_sha256_file(path)
+
+    h = _sha256_new()
+    with open(path, "rb", buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_MIN_SIZE:
+            # büyük dosyalar map edilip tek seferde hash'lenir; okuma
+            # tamponu kopyası olmaz, çekirdek ileri okumayı kendisi yapar
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, size, os.POSIX_FADV_SEQUENTIAL)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                h.update(mm)
+            return h.hexdigest()
+
+        mv = _read_buf()
         while True:
-            b = f.read(4 * 1024 * 1024)
-            if not b:
+            n = f.readinto(mv)
+            if not n:
                 break
-            h.update(b)
+            h.update(mv[:n])
     return h.hexdigest()
 
 
-def match_patterns(path: Path, patterns: List[str]) -> bool:
-    for pat in patterns or []:
-        if fnmatch.fnmatch(path.name, pat) or fnmatch.fnmatch(str(path), pat):
+def content_hash_file(path) -> str:
+    if HASH_ALGO == "blake3":
+        # update_mmap dosyayı map edip büyük girdileri Rayon ile paralel işler
+        h = blake3.blake3(max_threads=blake3.blake3.AUTO)
+        h.update_mmap(path)
+        return h.hexdigest()
+    return sha256_file(path)
+
+
+def chunk_file(path: Path):
+    # (offset, uzunluk, içerik hash'i, veri) dörtlüleri üretir
+    for c in fastcdc.fastcdc(
+        str(path),
+        min_size=CDC_MIN_CHUNK,
+        avg_size=CDC_AVG_CHUNK,
+        max_size=CDC_MAX_CHUNK,
+        fat=True,
+        hf=_hash_ctor
+    ):
+        yield c.offset, c.length, c.hash, c.data
+
+
+# Linux FICLONE ioctl numarası (_IOW(0x94, 9, int))
+FICLONE = 0x40049409
+
+
+def _load_clonefile():
+    if not IS_MAC:
+        return None
+    try:
+        fn = ctypes.CDLL(None, use_errno=True).clonefile
+    except (OSError, AttributeError):
+        return None
+    fn.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_uint32]
+    return fn
+
+
+_clonefile = _load_clonefile()
+
+
+# Klonu desteklemeyen (ör. ext4) ya da farklı disklerdeki (kaynak, hedef)
+# aygıt çiftleri; ilk başarısız denemeden sonra bu çiftlerde hedef dosya hiç
+# açılmadan doğrudan kopyaya geçilir.
+_REFLINK_UNSUPPORTED_ERRNOS = {
+    errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOTTY, errno.EINVAL, errno.EXDEV
+}
+_no_reflink = set()
+
+
+def _reflink_devs(src: str, dst: str):
+    try:
+        return os.stat(src).st_dev, os.stat(os.path.dirname(dst) or ".").st_dev
+    except OSError:
+        return None
+
+
+def try_reflink(src: str, dst: str) -> bool:
+    # XFS/Btrfs/APFS gibi dosya sistemlerinde veri kopyalamadan COW klon
+    if IS_WIN or (IS_MAC and _clonefile is None):
+        return False
+    devs = _reflink_devs(src, dst)
+    if devs is None or devs in _no_reflink:
+        return False
+
+    if _clonefile is not None:
+        if _clonefile(os.fsencode(src), os.fsencode(dst), 0) == 0:
             return True
-    return False
+        if ctypes.get_errno() in _REFLINK_UNSUPPORTED_ERRNOS:
+            _no_reflink.add(devs)
+        return False
+
+    try:
+        with open(src, "rb") as fs, open(dst, "wb") as fd:
+            fcntl.ioctl(fd.fileno(), FICLONE, fs.fileno())
+        return True
+    except OSError as e:
+        if e.errno in _REFLINK_UNSUPPORTED_ERRNOS:
+            _no_reflink.add(devs)
+        # başarısız denemenin bıraktığı boş dosya sonraki adımları bozmasın
+        try:
+            os.unlink(dst)
+        except OSError:
+            pass
+        return False
+
+
+def _copy_file_range(src: str, dst: str) -> bool:
+    if not hasattr(os, "copy_file_range"):
+        return False
+    try:
+        with open(src, "rb") as fs, open(dst, "wb") as fd:
+            while os.copy_file_range(fs.fileno(), fd.fileno(), 1 << 30):
+                pass
+        return True
+    except OSError:
+        return False
+
+
+def copy_file(src: str, dst: str):
+    # sırasıyla: COW klon → çekirdek içi kopya → shutil (sendfile/fcopyfile)
+    if not (try_reflink(src, dst) or _copy_file_range(src, dst)):
+        shutil.copyfile(src, dst)
+    shutil.copystat(src, dst)
+
+
+def ensure_hardlink_or_copy(src: str, dst: str):
+    # blob → snapshot: .store'daki blob'lar hiç değiştirilmediği için önce
+    # hardlink (tek syscall); olmazsa copy_file (COW klon / tam kopya)
+    try:
+        os.link(src, dst)
+    except OSError:
+        copy_file(src, dst)
 
 
-def should_process(path: Path, patterns: List[str], mode: str) -> bool:
-    matched = match_patterns(path, patterns)
+class BlobIndex:
+    # .store içindeki blob adlarının bellekteki kopyası; her <hh> dizini ilk
+    # sorulduğunda bir kez listelenir, sonrasında varlık kontrolü stat'sız
+    # bir küme sorgusudur. Yeni yazılan blob'lar add() ile eklenir.
+    def __init__(self, store: str):
+        self.store = store
+        self._shards = {}
+        self._lock = threading.Lock()
+
+    def _shard(self, prefix: str) -> set:
+        shard = self._shards.get(prefix)
+        if shard is None:
+            with self._lock:
+                shard = self._shards.get(prefix)
+                if shard is None:
+                    try:
+                        names = os.listdir(os.path.join(self.store, prefix))
+                    except FileNotFoundError:
+                        names = []
+                    # yarım kalmış geçici dosyalar (blob.tmp.*) sayılmaz
+                    shard = {n for n in names if "." not in n}
+                    self._shards[prefix] = shard
+        return shard
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self._shard(digest[:2])
+
+    def add(self, digest: str):
+        self._shard(digest[:2]).add(digest)
+
+
+def hash_and_store(
+    src: str, store: str, size: int, index: Optional[BlobIndex] = None
+) -> Tuple[str, str]:
+    # Kaynak tek sefer okunur: her parça hem hash'e hem geçici blob'a gider.
+    # Blob zaten varsa geçici dosya atılır.
+    h = new_hasher(size)
+    tmp = os.path.join(store, f"tmp.{os.getpid()}.{threading.get_ident()}")
+    mv = _read_buf()
+    try:
+        with open(src, "rb", buffering=0) as fs, open(tmp, "wb") as fd:
+            while True:
+                n = fs.readinto(mv)
+                if not n:
+                    break
+                h.update(mv[:n])
+                fd.write(mv[:n])
+        shutil.copystat(src, tmp)
+
+        digest = h.hexdigest()
+        blob = os.path.join(store, digest[:2], digest)
+        if index is not None:
+            present = digest in index
+        else:
+            present = os.path.exists(blob)
+        if present:
+            os.unlink(tmp)
+        else:
+            os.replace(tmp, blob)
+            if index is not None:
+                index.add(digest)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return digest, blob
+
+
+class BlobWriter:
+    # Blob kopyaları ve snapshot bağlantıları tek bir yazıcı thread'inde
+    # sırayla yapılır; işçiler yalnızca okur/hash'ler ve işi kuyruğa bırakır.
+    # Tek akış, aynı blob'a eşzamanlı yazma yarışını da ortadan kaldırır.
+    def __init__(self, index: BlobIndex, maxsize: int = 0):
+        self.index = index
+        self._q = queue.Queue(maxsize)
+        self._made_dirs = set()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def enqueue(self, src: Optional[str], blob: str, dst: str):
+        if self._error is not None:
+            raise self._error
+        self._q.put((src, blob, dst))
+
+    def _write(self, src: Optional[str], blob: str, dst: str):
+        if src is not None:
+            digest = os.path.basename(blob)
+            if digest not in self.index:
+                tmp = f"{blob}.tmp.{os.getpid()}"
+                copy_file(src, tmp)
+                os.replace(tmp, blob)
+                self.index.add(digest)
+
+        parent = os.path.dirname(dst)
+        if parent not in self._made_dirs:
+            os.makedirs(parent, exist_ok=True)
+            self._made_dirs.add(parent)
+        ensure_hardlink_or_copy(blob, dst)
+
+    def _run(self):
+        while True:
+            job = self._q.get()
+            if job is None:
+                return
+            if self._error is None:
+                try:
+                    self._write(*job)
+                except BaseException as e:
+                    self._error = e
+
+    def close(self):
+        self._q.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+def write_blob(blob: str, data: bytes):
+    tmp = f"{blob}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, blob)
+
+
+def split_patterns(patterns: List[str]) -> Tuple[frozenset, List[str]]:
+    # joker karakter içermeyen desenler (node_modules, .git ...) düz ad
+    # kümesine, gerçek glob'lar regex'e ayrılır
+    pats = [p.strip() for p in patterns or [] if p and p.strip()]
+    literals = frozenset(
+        os.path.normcase(p) for p in pats if not any(c in p for c in "*?[")
+    )
+    globs = [p for p in pats if any(c in p for c in "*?[")]
+    return literals, globs
+
+
+def compile_patterns(patterns: List[str]):
+    # tüm desenler tek bir regex alternasyonunda birleştirilir
+    pats = [p.strip() for p in patterns or [] if p and p.strip()]
+    if not pats:
+        return None
+    return re.compile("|".join(
+        f"(?:{fnmatch.translate(os.path.normcase(p))})" for p in pats
+    ))
+
+
+def make_filter(patterns: List[str], mode: str):
+    # should(name, full) -> bool; mod kontrolü dosya başına tekrarlanmaz.
+    # Önce düz adlar O(1) küme sorgusuyla, sonra glob'lar regex ile denenir.
+    literals, globs = split_patterns(patterns)
+    rx = compile_patterns(globs)
+    include = mode == "include"
+    if rx is None and not literals:
+        return lambda name, full: not include
+
+    match = rx.match if rx is not None else (lambda _: None)
+    norm = os.path.normcase if IS_WIN else None
+
+    def should(name: str, full: str) -> bool:
+        if norm is not None:
+            name, full = norm(name), norm(full)
+        matched = (
+            name in literals
+            or full in literals
+            or match(name) is not None
+            or match(full) is not None
+        )
+        return matched if include else not matched
+
+    return should
+
+
+def prune_dirs(patterns: List[str], mode: str) -> frozenset:
+    # hariç tutma modunda düz adlı desenlerle eşleşen dizinlere hiç inilmez
     if mode == "include":
-        return matched
-    return not matched
+        return frozenset()
+    return split_patterns(patterns)[0]
+
+
+def iter_files(root: str, prefix: str = "", skip_dirs: frozenset = frozenset()):
+    # (DirEntry, göreli posix yol) çiftleri üretir; DirEntry.stat() Windows'ta
+    # dizin okumasından gelen bilgiyi kullanır, ek stat çağrısı gerekmez.
+    # Özyinelemeli yield from zinciri yerine açık yığın kullanılır: derin
+    # ağaçlarda her dosya tüm üretici zincirinden geçmez.
+    stack = [(root, prefix)]
+    pop = stack.pop
+    push = stack.append
+    while stack:
+        d, pre = pop()
+        try:
+            it = os.scandir(d)
+        except OSError:
+            continue
+        with it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    if skip_dirs and os.path.normcase(e.name) in skip_dirs:
+                        continue
+                    push((e.path, f"{pre}{e.name}/"))
+                elif e.is_file():
+                    yield e, pre + e.name
 
 
 def list_snapshots(repo: Path) -> List[str]:
@@ -77,14 +701,98 @@ def list_snapshots(repo: Path) -> List[str]:
     return sorted(p.name for p in root.iterdir() if p.is_dir())
 
 
-def load_last_manifest(repo: Path) -> dict:
-    snaps = list_snapshots(repo)
-    if not snaps:
+def load_manifest(repo: Path, snapshot_id: str) -> dict:
+    path = repo / "snapshots" / snapshot_id / "manifest.json"
+    if not path.exists():
         return {}
-    last = repo / "snapshots" / snaps[-1] / "manifest.json"
-    if not last.exists():
-        return {}
-    return json.loads(last.read_text(encoding="utf-8"))
+    return _loads(path.read_text(encoding="utf-8"))
+
+
+def _iter_raw_entries(repo: Path, snapshot_id: str, header: dict):
+    if "entries" in header:
+        # eski biçim: girdiler manifest.json içinde
+        yield from header["entries"]
+        return
+
+    name = header.get("entries_file")
+    if not name:
+        return
+    snap_dir = repo / "snapshots" / snapshot_id
+
+    # ikili kopya varsa ve msgpack kuruluysa o okunur
+    packed = header.get("entries_msgpack")
+    if packed and msgpack is not None:
+        with (snap_dir / packed).open("rb") as f:
+            yield from msgpack.Unpacker(f, raw=False)
+        return
+
+    with (snap_dir / name).open(encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield _loads(line)
+
+
+def iter_manifest_rows(repo: Path, snapshot_id: str):
+    # MANIFEST_SCHEMA sırasında konumsal satırlar; eski sözlük biçimli
+    # manifestler de aynı şekle çevrilir
+    header = load_manifest(repo, snapshot_id)
+    raw = _iter_raw_entries(repo, snapshot_id, header)
+    schema = header.get("schema")
+    if schema == MANIFEST_SCHEMA:
+        yield from raw
+    elif schema:
+        pos = [schema.index(k) if k in schema else None for k in MANIFEST_SCHEMA]
+        for r in raw:
+            yield [r[i] if i is not None else None for i in pos]
+    else:
+        for e in raw:
+            yield [e.get(k) for k in MANIFEST_SCHEMA]
+
+
+def iter_manifest_entries(repo: Path, snapshot_id: str):
+    for r in iter_manifest_rows(repo, snapshot_id):
+        e = dict(zip(MANIFEST_SCHEMA, r))
+        if e["chunks"] is None:
+            del e["chunks"]
+        yield e
+
+
+def iter_last_manifest_rows(repo: Path):
+    # en yeni tamamlanmış snapshot kullanılır; yarıda kalmış bir çalışmanın
+    # manifest.json'u olmayan snapshot'ı atlanır. O snapshot başka bir hash
+    # şemasıyla alındıysa adresler karşılaştırılamaz, stat önbelleği boş başlar.
+    for snap in reversed(list_snapshots(repo)):
+        header = load_manifest(repo, snap)
+        if not header:
+            continue
+        if header.get("hash_scheme") != HASH_SCHEME:
+            return iter(())
+        return iter_manifest_rows(repo, snap)
+    return iter(())
+
+
+def snapshot_index(repo: Path, snapshot_id: str) -> Optional[dict]:
+    # manifest'ten klasör -> [(ad, göreli yol, boyut, klasör mü)] dizini kurar;
+    # GUI dosya ağacını files/ dizinini gezmeden bununla çizer. Manifesti
+    # olmayan snapshot'lar için None döner.
+    if not load_manifest(repo, snapshot_id):
+        return None
+
+    index = {"": []}
+
+    def ensure(d: str):
+        if d in index:
+            return
+        index[d] = []
+        up, _, name = d.rpartition("/")
+        ensure(up)
+        index[up].append((name, d, 0, True))
+
+    for r in iter_manifest_rows(repo, snapshot_id):
+        parent, _, name = r[0].rpartition("/")
+        ensure(parent)
+        index[parent].append((name, r[0], r[2] or 0, False))
+    return index
 
 
 # ----------------------------
@@ -105,101 +813,291 @@ def backup(
     (repo / "snapshots").mkdir(exist_ok=True)
     (repo / "logs").mkdir(exist_ok=True)
 
-    prev_manifest = load_last_manifest(repo)
-    prev_hashes = {e["path"]: e["hash"] for e in prev_manifest.get("entries", [])}
+    # path -> (size, mtime_ns, ino, hash, chunks)
+    prev_meta = {
+        r[0]: (r[2], r[4], r[5], r[1], r[6])
+        for r in iter_last_manifest_rows(repo)
+    }
 
     timestamp = dt.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     snapshot = repo / "snapshots" / timestamp
     files_dir = snapshot / "files"
     files_dir.mkdir(parents=True, exist_ok=True)
 
-    manifest = {"timestamp": timestamp, "entries": []}
+    # girdiler üretildikçe manifest.jsonl'e (ve varsa manifest.msgpack'e)
+    # akıtılır; manifest.json yalnızca küçük bir başlık tutar
+    manifest = {
+        "timestamp": timestamp,
+        "hash_scheme": HASH_SCHEME,
+        "algo": HASH_ALGO,
+        "schema": MANIFEST_SCHEMA,
+        "entries_file": MANIFEST_ENTRIES
+    }
+    if msgpack is not None:
+        manifest["entries_msgpack"] = MANIFEST_MSGPACK
+    entry_count = 0
+
+    # sıcak döngüde Path nesnesi üretmemek için düz string yollar kullanılır
+    store_str = os.fspath(repo / ".store")
+    files_str = os.fspath(files_dir)
+    join = os.path.join
+    store_dev = os.stat(store_str).st_dev
+
+    # 256 blob dizini bir kez açılır; snapshot dizinlerini BlobWriter
+    # çalışma boyunca hatırlar, böylece dosya başına mkdir çağrılmaz.
+    # Dolu bir depoda tek listdir yeter, 256 mkdir/EEXIST turu yapılmaz.
+    present = set(os.listdir(store_str))
+    for i in range(256):
+        shard = f"{i:02x}"
+        if shard not in present:
+            os.makedirs(join(store_str, shard), exist_ok=True)
+    known = BlobIndex(store_str)
+
+    def prefetch(i: int):
+        # sıradaki işçinin alacağı dosya hash'lenecekse çekirdeğe önceden
+        # okumaya başlamasını söyler (değişmemiş dosyalar okunmaz)
+        if i >= len(tasks):
+            return
+        e, logical_path, _ = tasks[i]
+        try:
+            st = e.stat()
+            prev = prev_meta.get(logical_path)
+            if prev and prev[:3] == (st.st_size, st.st_mtime_ns, st.st_ino):
+                return
+            fd = os.open(e.path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+    can_prefetch = hasattr(os, "posix_fadvise")
+
+    # sıcak döngüde global/öznitelik aramaları yerine yerel adlar kullanılır
+    prev_get = prev_meta.get
+    hash_file = content_hash_file
+
+    def process_one(
+        task: Tuple[os.DirEntry, str, bool], i: int
+    ) -> Tuple[Optional[list], bool]:
+        e, logical_path, cross_dev = task
+        s = e.path
+
+        if can_prefetch:
+            prefetch(i + BACKUP_WORKERS)
+
+        # stat hızlı yolu: boyut + mtime_ns + inode aynıysa hash yeniden
+        # hesaplanmaz, dosya doğrudan mevcut blob'dan snapshot'a bağlanır
+        try:
+            st = e.stat()
+            prev = prev_get(logical_path)
+            chunks = None
+            blob = None
+            if prev and prev[:3] == (st.st_size, st.st_mtime_ns, st.st_ino):
+                h, chunks = prev[3], prev[4]
+            elif fastcdc is not None and st.st_size >= CDC_MIN_SIZE:
+                # parçalar okunurken hem saklanır hem de tüm dosyanın hash'i
+                # aynı geçişte hesaplanır
+                fh = new_hasher(st.st_size)
+                chunks = []
+                for _, _, ch, data in chunk_file(s):
+                    fh.update(data)
+                    chunks.append(ch)
+                    if ch not in known:
+                        write_blob(join(store_str, ch[:2], ch), data)
+                        known.add(ch)
+                h = fh.hexdigest()
+            elif cross_dev:
+                # farklı disk: okuma ile blob yazımı tek geçişte birleştirilir
+                h, blob = hash_and_store(s, store_str, st.st_size, known)
+            else:
+                # aynı dosya sistemi: ayrı hash + copy_file (reflink / çekirdek
+                # içi kopya) veri taşımadan geçebilir
+                h = hash_file(s)
+        except OSError as err:
+            # dosya tarandıktan sonra silinmiş ya da okunamıyor: yedek
+            # durdurulmaz, dosya atlanır
+            log.warning("ATLANDI (okunamadı): %s (%s)", logical_path, err)
+            return None, False
+
+        # MANIFEST_SCHEMA sırasıyla
+        entry = [
+            logical_path,
+            h,
+            st.st_size,
+            int(st.st_mtime),
+            st.st_mtime_ns,
+            st.st_ino,
+            chunks
+        ]
+
+        changed = not (prev and prev[3] == h)
+
+        if chunks is not None:
+            # parçalı dosyalar files/ altına açılmaz; restore parçaları birleştirir
+            return entry, changed
+
+        # blob zaten yazıldıysa (hash_and_store) yalnızca bağlantı kuyruğa girer
+        if blob is None:
+            enqueue(s, join(store_str, h[:2], h), join(files_str, logical_path))
+        else:
+            enqueue(None, blob, join(files_str, logical_path))
+
+        return entry, changed
 
     total = 0
     taken = 0
     skipped = 0
+    failed = 0
 
-    for src in sources:
-        for _, _, files in os.walk(src):
-            total += len(files)
-
-    print(f"TOPLAM DOSYA: {total}")
+    should = make_filter(patterns, pattern_mode)
+    skip_dirs = prune_dirs(patterns, pattern_mode)
 
+    tasks = []
+    add_task = tasks.append
     for src in sources:
         src = src.resolve()
-        for dirpath, _, filenames in os.walk(src):
-            for name in filenames:
-                s = Path(dirpath) / name
-
-                if not should_process(s, patterns, pattern_mode):
-                    skipped += 1
-                    continue
+        # aygıt kaynak kökü başına bir kez öğrenilir: Windows'ta
+        # DirEntry.stat() st_dev'i her zaman 0 döndürür
+        cross_dev = os.stat(src).st_dev != store_dev
+        for e, rel in iter_files(os.fspath(src), f"{src.name}/", skip_dirs):
+            total += 1
 
-                rel = s.relative_to(src)
-                logical_path = f"{src.name}/{rel.as_posix()}"
+            if not should(e.name, e.path):
+                skipped += 1
+                continue
 
-                h = sha256_file(s)
+            add_task((e, rel, cross_dev))
 
-                if prev_hashes.get(logical_path) == h:
-                    skipped += 1
-                    print(f"ATLANDI (değişmedi): {logical_path}")
-                    continue
+    log.info("TOPLAM DOSYA: %d", total)
 
-                blob = repo / ".store" / h[:2] / h
-                blob.parent.mkdir(parents=True, exist_ok=True)
-                if not blob.exists():
-                    shutil.copy2(s, blob)
+    def results(ex: ThreadPoolExecutor):
+        # ex.map tüm işleri baştan kuyruğa alır; burada en fazla
+        # 2 * BACKUP_WORKERS iş havada tutulur ve sonuçlar sırayla alınır
+        pending = deque()
+        for i, task in enumerate(tasks):
+            pending.append(ex.submit(process_one, task, i))
+            if len(pending) >= 2 * BACKUP_WORKERS:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
 
-                dst = files_dir / logical_path
-                dst.parent.mkdir(parents=True, exist_ok=True)
-                shutil.copy2(blob, dst)
+    writer = BlobWriter(known, maxsize=4 * BACKUP_WORKERS)
+    enqueue = writer.enqueue
+    # handler yoksa dosya başına log çağrısı hiç yapılmaz
+    verbose = log.isEnabledFor(logging.INFO)
+    info = log.info
+    pack = _pack_entry
+    if msgpack is not None:
+        packb = msgpack.Packer(use_bin_type=True).pack
+        packed_file = (snapshot / MANIFEST_MSGPACK).open("wb", buffering=1 << 20)
+    else:
+        packb = None
+        packed_file = nullcontext()
+    try:
+        with ThreadPoolExecutor(max_workers=BACKUP_WORKERS) as ex, \
+                (snapshot / MANIFEST_ENTRIES).open("wb", buffering=1 << 20) as mf, \
+                packed_file as pf:
+            write = mf.write
+            write_packed = pf.write if packb is not None else None
+            for entry, changed in results(ex):
+                if entry is None:
+                    failed += 1
+                    continue
+                write(pack(entry))
+                if write_packed is not None:
+                    write_packed(packb(entry))
+                entry_count += 1
 
-                manifest["entries"].append({
-                    "path": logical_path,
-                    "hash": h,
-                    "size": s.stat().st_size,
-                    "mtime": int(s.stat().st_mtime)
-                })
+                if not changed:
+                    skipped += 1
+                    if verbose:
+                        info("ATLANDI (değişmedi): %s", entry[0])
+                    continue
 
                 taken += 1
-                remaining = total - (taken + skipped)
-
-                print(
-                    f"İLERLEME → "
-                    f"Toplam:{total} | "
-                    f"Alınan:{taken} | "
-                    f"Atlanan:{skipped} | "
-                    f"Kalan:{remaining}"
+                if not verbose:
+                    continue
+                remaining = total - (taken + skipped + failed)
+
+                info(
+                    "İLERLEME → Toplam:%d | Alınan:%d | Atlanan:%d | Kalan:%d",
+                    total, taken, skipped, remaining
                 )
+    finally:
+        writer.close()
 
+    manifest["entry_count"] = entry_count
     (snapshot / "manifest.json").write_text(
-        json.dumps(manifest, ensure_ascii=False, indent=2),
+        _dumps(manifest),
         encoding="utf-8"
     )
 
-    print("✔ Snapshot oluşturuldu:", snapshot)
+    log.info("✔ Snapshot oluşturuldu: %s", snapshot)
 
 
 # ----------------------------
 # Restore
 # ----------------------------
 
+def restore_chunks(repo: Path, entry: dict, dst: Path):
+    store = repo / ".store"
+    with dst.open("wb") as out:
+        for ch in entry["chunks"]:
+            with (store / ch[:2] / ch).open("rb") as f:
+                shutil.copyfileobj(f, out, 4 * 1024 * 1024)
+    os.utime(dst, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+
+
 def restore_full_snapshot(repo: Path, snapshot_id: str, target: Path):
-    src = repo / "snapshots" / snapshot_id / "files"
-    for root, _, files in os.walk(src):
-        for f in files:
-            p = Path(root) / f
-            rel = p.relative_to(src)
-            dst = target / rel
-            dst.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copy2(p, dst)
+    # dosyalar RESTORE_WORKERS thread'inde kopyalanır; copy_file önce
+    # reflink, sonra çekirdek içi copy_file_range dener
+    src = os.fspath(repo / "snapshots" / snapshot_id / "files")
+    target_str = os.fspath(target)
+    made_dirs = set()
+
+    def prepare(rel: str) -> str:
+        dst = os.path.join(target_str, rel)
+        parent = os.path.dirname(dst)
+        if parent not in made_dirs:
+            os.makedirs(parent, exist_ok=True)
+            made_dirs.add(parent)
+        return dst
+
+    with ThreadPoolExecutor(max_workers=RESTORE_WORKERS) as ex:
+        pending = deque()
+
+        def submit(fn, *args):
+            pending.append(ex.submit(fn, *args))
+            if len(pending) >= 4 * RESTORE_WORKERS:
+                pending.popleft().result()
+
+        for e, rel in iter_files(src):
+            submit(copy_file, e.path, prepare(rel))
+
+        for e in iter_manifest_entries(repo, snapshot_id):
+            if "chunks" in e:
+                submit(restore_chunks, repo, e, Path(prepare(e["path"])))
+
+        while pending:
+            pending.popleft().result()
 
 
 def restore_single_file(repo: Path, snapshot_id: str, rel_path: str, target: Path):
     src = repo / "snapshots" / snapshot_id / "files" / rel_path
     if not src.exists():
+        logical_path = Path(rel_path).as_posix()
+        for e in iter_manifest_entries(repo, snapshot_id):
+            if e["path"] == logical_path and "chunks" in e:
+                target.mkdir(parents=True, exist_ok=True)
+                dst = target / src.name
+                restore_chunks(repo, e, dst)
+                return dst
         raise RuntimeError("Dosya bulunamadı")
     target.mkdir(parents=True, exist_ok=True)
     dst = target / src.name
-    shutil.copy2(src, dst)
+    copy_file(os.fspath(src), os.fspath(dst))
     return dst
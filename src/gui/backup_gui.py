@@ -1,7 +1,8 @@
 ﻿# -*- coding: utf-8 -*-
 import sys
 import os
-import threading
+import logging
+from collections import OrderedDict, deque
 from pathlib import Path
 
 current_dir = Path(__file__).resolve().parent
@@ -12,24 +13,139 @@ if str(project_root) not in sys.path:
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QPushButton, QVBoxLayout, QHBoxLayout,
     QFileDialog, QLabel, QTextEdit, QLineEdit, QCheckBox, QListWidget, QTabWidget,
-    QRadioButton, QTreeWidget, QTreeWidgetItem, QMessageBox
+    QRadioButton, QTreeWidget, QTreeWidgetItem, QMessageBox, QStyledItemDelegate
 )
-from PyQt6.QtCore import Qt, QObject, pyqtSignal
-
-from src.engine.backup_engine import (
-    backup, list_snapshots, restore_full_snapshot, restore_single_file
+from PyQt6.QtCore import (
+    Qt, QObject, QRunnable, QSettings, QThread, QThreadPool, QTimer,
+    pyqtSignal, pyqtSlot
 )
 
 
+def _engine():
+    # motor ve isteğe bağlı hash/G/Ç kütüphaneleri pencere açıldıktan sonra,
+    # ilk kullanımda yüklenir; sonraki çağrılar sys.modules'tan gelir
+    from src.engine import backup_engine
+    return backup_engine
+
+
+# dosya ağacı öğelerinde mutlak yolun tutulduğu rol
+PATH_ROLE = Qt.ItemDataRole.UserRole + 1
+
+_GIB = 1 << 30
+
+
+class SizeDelegate(QStyledItemDelegate):
+    # boyut sütununda ham bayt sayısı tutulur; GB metni yalnızca satır
+    # çizilirken üretilir, görünmeyen satırlar için biçimlendirme yapılmaz
+    def displayText(self, value, locale):
+        if isinstance(value, int):
+            return f"{value / _GIB:.3f}"
+        return super().displayText(value, locale)
+
+
 # ----------------- Log emitter -----------------
 
 class LogEmitter(QObject):
     message = pyqtSignal(str)
 
 
+class QtLogHandler(logging.Handler):
+    # motorun log kayıtlarını GUI'nin log tamponuna bırakır; deque.append
+    # thread-güvenlidir, QTextEdit'e yalnızca ana thread'deki zamanlayıcı
+    # yazar. Satır başına sinyal/olay kuyruğa girmez.
+    def __init__(self, buf: deque):
+        super().__init__(logging.INFO)
+        self.buf = buf
+
+    def emit(self, record):
+        try:
+            self.buf.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+# ----------------- Jobs -----------------
+
+class Job(QRunnable):
+    # yedekleme/restore işleri uygulamanın QThreadPool'unda çalışır
+    def __init__(self, fn, *args):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+
+    def run(self):
+        self.fn(*self.args)
+
+
+# ----------------- Snapshot walker -----------------
+
+class SnapshotWalker(QObject):
+    # Klasör listeleme ve stat işi ayrı bir QThread'de yapılır; sonuçlar
+    # WALK_BATCH'lik parçalar halinde sinyalle ana thread'e gönderilir.
+    # batch: (anahtar, [(ad, göreli yol, tam yol, boyut, klasör mü)])
+    WALK_BATCH = 500
+
+    batch = pyqtSignal(str, list)
+    finished = pyqtSignal(str)
+    index_ready = pyqtSignal(str, object)
+
+    def __init__(self):
+        super().__init__()
+        # ana thread'in güncel seçim nesli; anahtarı eski nesle ait işler
+        # başlamadan ya da parça aralarında bırakılır
+        self.gen = 0
+
+    def _stale(self, key):
+        return int(key.split(":", 1)[0]) != self.gen
+
+    @pyqtSlot(str, str, str)
+    def load_index(self, key, repo, snap):
+        if self._stale(key):
+            return
+        # manifest okunamazsa None gönderilir, ağaç klasör gezerek kurulur
+        try:
+            index = _engine().snapshot_index(Path(repo), snap)
+        except Exception:
+            index = None
+        self.index_ready.emit(key, index)
+
+    @pyqtSlot(str, str, str)
+    def list_dir(self, key, path, prefix):
+        entries = []
+        if self._stale(key):
+            self.finished.emit(key)
+            return
+        try:
+            it = os.scandir(path)
+        except OSError:
+            self.finished.emit(key)
+            return
+        with it:
+            for e in it:
+                try:
+                    is_dir = e.is_dir(follow_symlinks=False)
+                    size = 0 if is_dir else e.stat().st_size
+                except OSError:
+                    continue
+                entries.append((e.name, prefix + e.name, e.path, size, is_dir))
+                if len(entries) >= self.WALK_BATCH:
+                    if self._stale(key):
+                        break
+                    self.batch.emit(key, entries)
+                    entries = []
+        if entries and not self._stale(key):
+            self.batch.emit(key, entries)
+        self.finished.emit(key)
+
+
 # ----------------- Main Window -----------------
 
 class BackupRestoreApp(QMainWindow):
+    SNAP_CACHE_SIZE = 16
+
+    walk_requested = pyqtSignal(str, str, str)
+    index_requested = pyqtSignal(str, str, str)
+
     def __init__(self):
         super().__init__()
         self.setWindowTitle("Portable Incremental Backup Tool - GUI (Sergen Başakcı)")
@@ -38,8 +154,50 @@ class BackupRestoreApp(QMainWindow):
         self.log_emitter = LogEmitter()
         self.log_emitter.message.connect(self.append_log)
 
+        # log satırları biriktirilir ve 100 ms'de bir tek seferde eklenir;
+        # dosya başına bir append/yeniden yerleşim yapılmaz
+        self._log_buf = deque()
+
+        self.log_handler = QtLogHandler(self._log_buf)
+
         self._build_ui()
 
+        self._log_timer = QTimer(self)
+        self._log_timer.timeout.connect(self._flush_log)
+        self._log_timer.start(100)
+
+        # ok tuşlarıyla gezinirken her seçimde yükleme yapılmaz; seçim
+        # 200 ms sabit kalınca son seçilen snapshot yüklenir
+        self._sel_timer = QTimer(self)
+        self._sel_timer.setSingleShot(True)
+        self._sel_timer.setInterval(200)
+        self._sel_timer.timeout.connect(self._do_snapshot_load)
+
+        # uzun işler için tek havuz; aynı anda en fazla iki iş çalışır
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(2)
+
+        # dosya ağacı klasörleri arka plandaki walker thread'inde listelenir;
+        # anahtarlar seçim nesline göre verilir, eski snapshot'tan geç gelen
+        # parçalar yok sayılır
+        self._walk_gen = 0
+        self._walk_parents = {}
+        self._index = None
+        # (repo, snapshot, mtime) -> manifest dizini; son SNAP_CACHE_SIZE seçim
+        self._snap_cache = OrderedDict()
+        self._pending_cache_key = None
+        self._walker_thread = QThread(self)
+        self._walker = SnapshotWalker()
+        self._walker.moveToThread(self._walker_thread)
+        self.walk_requested.connect(self._walker.list_dir)
+        self.index_requested.connect(self._walker.load_index)
+        self._walker.index_ready.connect(self._on_index_ready)
+        self._walker.batch.connect(self._on_walk_batch)
+        self._walker.finished.connect(self._on_walk_finished)
+        self._walker_thread.start()
+
+        self._load_settings()
+
     # ---------------- UI ----------------
 
     def _build_ui(self):
@@ -50,6 +208,8 @@ class BackupRestoreApp(QMainWindow):
         backup_layout = QVBoxLayout()
 
         self.sources_list = QListWidget()
+        # liste widget'ıyla aynı sırada tutulan kaynak yolları
+        self._sources = []
 
         src_btns = QHBoxLayout()
         btn_add = QPushButton("Kaynak Klasör Ekle")
@@ -115,11 +275,18 @@ class BackupRestoreApp(QMainWindow):
 
         self.snapshot_tree = QTreeWidget()
         self.snapshot_tree.setHeaderLabels(["Snapshot (+)"])
+        self.snapshot_tree.setUniformRowHeights(True)
+        self.snapshot_tree.setAnimated(False)
         self.snapshot_tree.itemSelectionChanged.connect(self.snapshot_selected)
 
         self.file_tree = QTreeWidget()
         self.file_tree.setHeaderLabels(["Dosya / Klasör", "Boyut (GB)"])
         self.file_tree.setColumnWidth(0, 520)
+        self.file_tree.setUniformRowHeights(True)
+        self.file_tree.setAnimated(False)
+        self.file_tree.setSortingEnabled(False)
+        self.file_tree.setItemDelegateForColumn(1, SizeDelegate(self.file_tree))
+        self.file_tree.itemExpanded.connect(self._on_file_item_expanded)
 
         split = QHBoxLayout()
         split.addWidget(self.snapshot_tree, 1)
@@ -153,6 +320,7 @@ class BackupRestoreApp(QMainWindow):
         # ---------- LOG ----------
         self.log_output = QTextEdit()
         self.log_output.setReadOnly(True)
+        self.log_output.document().setMaximumBlockCount(5000)
 
         main = QWidget()
         lay = QVBoxLayout()
@@ -170,17 +338,28 @@ class BackupRestoreApp(QMainWindow):
 
     def append_log(self, txt):
         if txt:
-            self.log_output.append(txt)
-            self.log_output.ensureCursorVisible()
+            self._log_buf.append(txt)
+
+    def _flush_log(self):
+        if not self._log_buf:
+            return
+        # işçi thread'i bu sırada ekleme yapabilir; yalnızca alınanlar çıkarılır
+        buf = self._log_buf
+        chunk = "\n".join(buf.popleft() for _ in range(len(buf)))
+        self.log_output.append(chunk)
+        self.log_output.ensureCursorVisible()
 
     def add_source(self):
         d = QFileDialog.getExistingDirectory(self, "Kaynak Seç")
         if d:
             self.sources_list.addItem(d)
+            self._sources.append(Path(d))
 
     def remove_source(self):
         for i in self.sources_list.selectedItems():
-            self.sources_list.takeItem(self.sources_list.row(i))
+            row = self.sources_list.row(i)
+            self.sources_list.takeItem(row)
+            del self._sources[row]
 
     def select_repo(self):
         d = QFileDialog.getExistingDirectory(self, "Repo Seç")
@@ -198,12 +377,37 @@ class BackupRestoreApp(QMainWindow):
         if d:
             self.restore_target.setText(d)
 
+    # ---------------- Settings ----------------
+
+    def _load_settings(self):
+        # son oturumdaki kaynaklar, repo ve filtre ayarları geri yüklenir
+        st = QSettings("Basakci", "BackupTool")
+        for d in st.value("sources", [], type=list):
+            self.sources_list.addItem(d)
+            self._sources.append(Path(d))
+        repo = st.value("repo", "", type=str)
+        if repo:
+            self.repo_edit.setText(repo)
+            self.restore_repo.setText(repo)
+        self.patterns_edit.setText(
+            st.value("patterns", self.patterns_edit.text(), type=str))
+        if st.value("mode", "exclude", type=str) == "include":
+            self.rb_include.setChecked(True)
+        self.chk_vss.setChecked(st.value("vss", False, type=bool))
+
+    def _save_settings(self):
+        st = QSettings("Basakci", "BackupTool")
+        st.setValue("sources", [str(p) for p in self._sources])
+        st.setValue("repo", self.repo_edit.text().strip())
+        st.setValue("patterns", self.patterns_edit.text())
+        st.setValue("mode", "exclude" if self.rb_exclude.isChecked() else "include")
+        st.setValue("vss", self.chk_vss.isChecked())
+
     # ---------------- Backup ----------------
 
     def start_backup(self):
         repo = self.repo_edit.text().strip()
-        sources = [self.sources_list.item(i).text()
-                   for i in range(self.sources_list.count())]
+        sources = list(self._sources)
 
         if not repo or not sources:
             self.append_log("❌ Repo veya kaynak eksik")
@@ -215,102 +419,218 @@ class BackupRestoreApp(QMainWindow):
 
         self.append_log("🚀 Yedekleme başlatıldı")
 
-        th = threading.Thread(
-            target=self._run_backup,
-            args=(repo, sources, patterns, mode, vss),
-            daemon=True
-        )
-        th.start()
+        self._pool.start(Job(self._run_backup, repo, sources, patterns, mode, vss))
 
     def _run_backup(self, repo, sources, patterns, mode, vss):
-        class Out:
-            def write(_, s):
-                s = s.strip()
-                if s:
-                    self.log_emitter.message.emit(s)
-            def flush(_): pass
-
-        old = sys.stdout
-        sys.stdout = Out()
+        # handler yalnızca yedekleme süresince bağlı kalır
+        engine = _engine()
+        engine.log.addHandler(self.log_handler)
+        engine.log.setLevel(logging.INFO)
         try:
-            backup(Path(repo), [Path(s) for s in sources],
-                   patterns, mode, vss, 3)
+            engine.backup(Path(repo), sources, patterns, mode, vss, 3)
             self.log_emitter.message.emit("✅ Yedekleme tamamlandı")
         except Exception as e:
             self.log_emitter.message.emit(f"❌ Hata: {e}")
         finally:
-            sys.stdout = old
+            engine.log.removeHandler(self.log_handler)
 
     # ---------------- Restore ----------------
 
     def load_snapshots(self):
         self.snapshot_tree.clear()
-        self.file_tree.clear()
+        self._reset_file_tree()
 
         repo = Path(self.restore_repo.text().strip())
-        for s in list_snapshots(repo):
+        items = []
+        for s in _engine().list_snapshots(repo):
             it = QTreeWidgetItem([s])
             it.setData(0, Qt.ItemDataRole.UserRole, s)
             it.addChild(QTreeWidgetItem(["(+)"]))
-            self.snapshot_tree.addTopLevelItem(it)
+            items.append(it)
+
+        # tek çağrıda eklenir; öğe başına yeniden çizim/sinyal olmaz
+        tree = self.snapshot_tree
+        tree.setUpdatesEnabled(False)
+        tree.blockSignals(True)
+        try:
+            # list_snapshots zaten sıralı döner; ek sıralama yapılmaz
+            tree.addTopLevelItems(items)
+        finally:
+            tree.blockSignals(False)
+            tree.setUpdatesEnabled(True)
 
     def snapshot_selected(self):
+        self._sel_timer.start()
+
+    def _do_snapshot_load(self):
         items = self.snapshot_tree.selectedItems()
         if not items:
             return
         snap = items[0].data(0, Qt.ItemDataRole.UserRole)
         self.load_files(snap)
 
-    def load_files(self, snap):
+    def _reset_file_tree(self):
+        # ağaç silinmeden önce nesil artırılır; kuyrukta bekleyen eski
+        # index/batch sinyalleri silinmiş öğelere ulaşmaz
+        self._walk_gen += 1
+        self._walker.gen = self._walk_gen
+        self._walk_parents.clear()
+        self._index = None
         self.file_tree.clear()
-        root = Path(self.restore_repo.text()) / "snapshots" / snap / "files"
+
+    def load_files(self, snap):
+        self._reset_file_tree()
+        repo = self.restore_repo.text()
+        root = Path(repo) / "snapshots" / snap / "files"
 
         root_item = QTreeWidgetItem([snap])
+        root_item.setData(0, PATH_ROLE, str(root))
         self.file_tree.addTopLevelItem(root_item)
-        node_map = {root: root_item}
-
-        for dp, dns, fns in os.walk(root):
-            dp = Path(dp)
-            parent = node_map.get(dp)
-            if not parent:
-                continue
-
-            for d in dns:
-                p = dp / d
-                it = QTreeWidgetItem([d, ""])
-                it.setData(0, Qt.ItemDataRole.UserRole,
-                           str(p.relative_to(root)))
-                parent.addChild(it)
-                node_map[p] = it
-
-            for f in fns:
-                p = dp / f
-                gb = p.stat().st_size / (1024 ** 3)
-                it = QTreeWidgetItem([f, f"{gb:.3f}"])
-                it.setData(0, Qt.ItemDataRole.UserRole,
-                           str(p.relative_to(root)))
-                parent.addChild(it)
+
+        # aynı snapshot daha önce açıldıysa dizin önbellekten gelir;
+        # snapshot dizininin mtime'ı anahtarda olduğundan değişiklik fark edilir
+        try:
+            mtime = os.stat(root.parent).st_mtime_ns
+        except OSError:
+            mtime = None
+        cache_key = (repo, snap, mtime)
+        index = self._snap_cache.get(cache_key)
+        if index is not None:
+            self._snap_cache.move_to_end(cache_key)
+            self._index = index
+            self._fill_dir(root_item)
+            root_item.setExpanded(True)
+            return
+
+        # önce snapshot manifesti okunur (tek sıralı okuma, parçalı dosyalar
+        # dahil); kök seviyesi dizin hazır olunca doldurulur
+        key = f"{self._walk_gen}:{root}"
+        self._walk_parents[key] = root_item
+        self._pending_cache_key = cache_key
+        self.index_requested.emit(key, repo, snap)
+
+    def _on_index_ready(self, key, index):
+        root_item = self._walk_parents.pop(key, None)
+        if root_item is None:
+            return
+        if index is not None:
+            self._snap_cache[self._pending_cache_key] = index
+            if len(self._snap_cache) > self.SNAP_CACHE_SIZE:
+                self._snap_cache.popitem(last=False)
+        self._index = index
+        # alt klasörler açıldıklarında doldurulur
+        self._fill_dir(root_item)
+        root_item.setExpanded(True)
+
+    def _fill_dir(self, parent):
+        path = parent.data(0, PATH_ROLE)
+        rel_dir = parent.data(0, Qt.ItemDataRole.UserRole)
+
+        if self._index is not None:
+            # manifest dizini bellekte: klasör içeriği doğrudan eklenir
+            # göreli yollar önekten dilimlenmeden/Path kurulmadan doğrudan
+            # kullanılır; ayırıcı yalnızca Windows'ta çevrilir
+            d = rel_dir.replace(os.sep, "/") if rel_dir else ""
+            base = path + os.sep
+            if os.sep == "/":
+                entries = [
+                    (name, rel, base + name, size, is_dir)
+                    for name, rel, size, is_dir in self._index.get(d, ())
+                ]
+            else:
+                entries = [
+                    (name, rel.replace("/", os.sep), base + name, size, is_dir)
+                    for name, rel, size, is_dir in self._index.get(d, ())
+                ]
+            self._add_entries(parent, entries)
+            return
+
+        # manifest yoksa klasörün doğrudan çocukları walker thread'inde listelenir
+        prefix = rel_dir + os.sep if rel_dir else ""
+        key = f"{self._walk_gen}:{path}"
+        self._walk_parents[key] = parent
+        self.walk_requested.emit(key, path, prefix)
+
+    def _on_walk_batch(self, key, entries):
+        parent = self._walk_parents.get(key)
+        if parent is not None:
+            self._add_entries(parent, entries)
+
+    def _add_entries(self, parent, entries):
+        # alt klasörlere açılınca doldurulmak üzere boş bir yer tutucu konur;
+        # öğeler ağaca bağlanmadan kurulur, sonra tek addChildren ile eklenir
+        items = []
+        for name, rel, path, size, is_dir in entries:
+            if is_dir:
+                item = QTreeWidgetItem([name, ""])
+                item.addChild(QTreeWidgetItem(["", ""]))
+            else:
+                item = QTreeWidgetItem([name])
+                item.setData(1, Qt.ItemDataRole.DisplayRole, size)
+            item.setData(0, Qt.ItemDataRole.UserRole, rel)
+            item.setData(0, PATH_ROLE, path)
+            items.append(item)
+
+        tree = self.file_tree
+        tree.setUpdatesEnabled(False)
+        tree.blockSignals(True)
+        try:
+            parent.addChildren(items)
+        finally:
+            tree.blockSignals(False)
+            tree.setUpdatesEnabled(True)
+
+    def _on_walk_finished(self, key):
+        self._walk_parents.pop(key, None)
+
+    def _on_file_item_expanded(self, item):
+        # yer tutucu varsa ilk açılışta gerçek içerikle değiştirilir
+        if item.childCount() == 1 and item.child(0).data(0, PATH_ROLE) is None:
+            item.takeChildren()
+            self._fill_dir(item)
+
+    def closeEvent(self, event):
+        self._save_settings()
+        self._walker_thread.quit()
+        self._walker_thread.wait()
+        super().closeEvent(event)
 
     def restore_full(self):
-        restore_full_snapshot(
-            Path(self.restore_repo.text()),
-            self.snapshot_tree.selectedItems()[0].text(0),
-            Path(self.restore_target.text())
-        )
-        self.append_log("✅ TAM restore tamamlandı")
+        # seçimler ana thread'de okunur, kopyalama havuzda yapılır
+        self._pool.start(Job(
+            self._run_restore,
+            _engine().restore_full_snapshot,
+            (
+                Path(self.restore_repo.text()),
+                self.snapshot_tree.selectedItems()[0].text(0),
+                Path(self.restore_target.text())
+            ),
+            "✅ TAM restore tamamlandı"
+        ))
 
     def restore_file(self):
         item = self.file_tree.selectedItems()
         if not item:
             return
         rel = item[0].data(0, Qt.ItemDataRole.UserRole)
-        restore_single_file(
-            Path(self.restore_repo.text()),
-            self.snapshot_tree.selectedItems()[0].text(0),
-            rel,
-            Path(self.restore_target.text())
-        )
-        self.append_log("✅ Tek dosya restore edildi")
+        self._pool.start(Job(
+            self._run_restore,
+            _engine().restore_single_file,
+            (
+                Path(self.restore_repo.text()),
+                self.snapshot_tree.selectedItems()[0].text(0),
+                rel,
+                Path(self.restore_target.text())
+            ),
+            "✅ Tek dosya restore edildi"
+        ))
+
+    def _run_restore(self, fn, args, done_msg):
+        try:
+            fn(*args)
+            self.log_emitter.message.emit(done_msg)
+        except Exception as e:
+            self.log_emitter.message.emit(f"❌ Hata: {e}")
 
 
 # ---------------- Main ----------------
@@ -1,29 +1,40 @@
 # -*- coding: utf-8 -*-
+import os
 import sys
-import traceback
-from pathlib import Path
+
+# hata kutusu yalnızca Windows'ta; fonksiyon bir kez çözülür
+if sys.platform == "win32":
+    import ctypes
+    _MessageBoxW = ctypes.windll.user32.MessageBoxW
+    _MessageBoxW.argtypes = [
+        ctypes.c_void_p, ctypes.c_wchar_p, ctypes.c_wchar_p, ctypes.c_uint
+    ]
+else:
+    _MessageBoxW = None
 
 def show_error(title, msg):
-    try:
-        import ctypes
-        ctypes.windll.user32.MessageBoxW(0, msg, title, 0x10)
-    except:
+    if _MessageBoxW is not None:
+        _MessageBoxW(None, str(msg), str(title), 0x10)
+    else:
         print(msg, file=sys.stderr)
 
 def main():
     try:
-        if getattr(sys, "frozen", False):
-            root = Path(sys._MEIPASS)
-        else:
-            root = Path(__file__).resolve().parent.parent
-
-        if str(root) not in sys.path:
-            sys.path.insert(0, str(root))
+        # paketlenmiş exe'de _MEIPASS zaten sys.path'te; yalnızca geliştirme
+        # ortamında proje kökü eklenir
+        if not getattr(sys, "frozen", False):
+            root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+            if root not in sys.path:
+                sys.path.insert(0, root)
 
         from src.gui.backup_gui import main as gui_main
         gui_main()
 
     except Exception:
+        # konsolda yorumlayıcının kendi traceback çıktısı yeterli
+        if _MessageBoxW is None:
+            raise
+        import traceback
         show_error("Başlatma Hatası", traceback.format_exc())
         sys.exit(1)
 